@@ -13,11 +13,13 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import dataclasses
 import os
 import re
 import stat
 import sys
 import tarfile
+from operator import attrgetter
 from pathlib import Path
 
 import pytest
@@ -25,239 +27,218 @@ from craft_parts.overlays import overlays
 from rockcraft import errors, layers
 
 
-def get_tar_contents(tar_path: Path) -> list[str]:
-    with tarfile.open(tar_path, "r") as tar_file:
-        return tar_file.getnames()
+@pytest.fixture()
+def fake_path(fs):
+    """Provide an empty directory in an in-memory filesystem."""
+    path = Path("/fake")
+    fs.create_dir(path)
+    return path
 
 
-def duplicate_dirs_setup(tmp_path) -> tuple[Path, Path]:
-    """Create a filetree with an upper layer and a fake 'rootfs' structure.
+@pytest.fixture()
+def mock_tar_add(mocker):
+    """Record the entries added to tarballs without actually archiving them.
 
-    layer_dir/
-      |- bin/dir1/a.txt
-      |- usr/bin/dir1/b.txt
-    rootfs/
-      |- usr/bin/
-      |- bin ----> usr/bin (symlink)
-
-    returns a tuple with (layer_dir, rootfs).
+    Use ``get_tar_contents()`` to get the names as they would be stored in the
+    tarball.
     """
+    return mocker.patch.object(tarfile.TarFile, "add", autospec=True)
 
-    layer_dir = tmp_path / "layer_dir"
-    layer_dir.mkdir()
-
-    # The new layer has "bin/dir1/a.txt" and "usr/bin/dir1/b.txt".
-    (layer_dir / "bin/dir1").mkdir(parents=True)
-    (layer_dir / "bin/dir1/a.txt").touch()
-    (layer_dir / "usr/bin/dir1").mkdir(parents=True)
-    (layer_dir / "usr/bin/dir1/b.txt").touch()
-
-    rootfs_dir = tmp_path / "rootfs"
-    rootfs_dir.mkdir()
-    # In the base layer "bin" is a symlink to "usr/bin"
-    (rootfs_dir / "usr/bin").mkdir(parents=True)
-    (rootfs_dir / "bin").symlink_to("usr/bin")
-
-    return layer_dir, rootfs_dir
-
-
-def test_archive_layer_directories(tmp_path):
-    """Test that adding a directory as a layer explicitly preserves subdirs"""
-    layer_dir = tmp_path / "layer_dir"
-    layer_dir.mkdir()
-
-    (layer_dir / "first").mkdir()
-    (layer_dir / "first/first.txt").touch()
-
-    (layer_dir / "second").mkdir()
-    (layer_dir / "second/second.txt").touch()
 
-    temp_tar_path = tmp_path / "layer.tar"
-    layers.archive_layer(layer_dir, temp_tar_path)
-    temp_tar_contents = get_tar_contents(temp_tar_path)
-
-    expected_tar_contents = [
-        "first",
-        "first/first.txt",
-        "second",
-        "second/second.txt",
+def get_tar_contents(mock_tar_add) -> list[str]:
+    # Normalize separators like TarFile.gettarinfo() does when storing the names.
+    return [
+        mock_call.kwargs["arcname"].replace(os.sep, "/")
+        for mock_call in mock_tar_add.mock_calls
+        if "arcname" in mock_call.kwargs
     ]
-    assert temp_tar_contents == expected_tar_contents
-
-
-def test_archive_layer_symlinks(tmp_path):
-    """
-    Test creating a new layer with symlinks (both file and dir).
-    """
-    layer_dir = tmp_path / "layer_dir"
-    layer_dir.mkdir()
-
-    (layer_dir / "first_dir").mkdir()
-    (layer_dir / "first_file").touch()
 
-    (layer_dir / "second_dir").symlink_to("first_dir", target_is_directory=True)
-    (layer_dir / "second_file").symlink_to("first_file", target_is_directory=False)
 
-    temp_tar_path = tmp_path / "layer.tar"
-    layers.archive_layer(layer_dir, temp_tar_path)
-    temp_tar_contents = get_tar_contents(temp_tar_path)
-
-    expected_tar_contents = [
-        "first_dir",
-        "first_file",
-        "second_dir",
-        "second_file",
-    ]
-    assert temp_tar_contents == expected_tar_contents
+@dataclasses.dataclass(frozen=True)
+class Symlink:
+    """A symbolic link to ``target`` in a filesystem tree."""
 
+    target: str
+    target_is_directory: bool = False
 
-def test_archive_layer_with_base_layer_dir(tmp_path):
-    """Test creating a layer with a base layer dir for reference."""
-    layer_dir = tmp_path / "layer_dir"
-    layer_dir.mkdir()
 
-    (layer_dir / "first").mkdir()
-    (layer_dir / "first/first.txt").touch()
-
-    (layer_dir / "second").mkdir()
-    (layer_dir / "second/second.txt").touch()
-
-    # Create a dir tree to act as extracted "base"
-    # It contains a "first" dir and a "second" symlink pointing to "first"
-    rootfs_dir = tmp_path / "rootfs"
-    rootfs_dir.mkdir()
-
-    (rootfs_dir / "first").mkdir()
-    (rootfs_dir / "second").symlink_to("first")
-
-    temp_tar_path = tmp_path / "layer.tar"
-    layers.archive_layer(layer_dir, temp_tar_path, base_layer_dir=rootfs_dir)
-    temp_tar_contents = get_tar_contents(temp_tar_path)
+def create_tree(tree: dict, root: Path | str) -> None:
+    """Create the filesystem ``tree`` inside ``root``.
 
+    Dict values are directories, Symlink values are symlinks, and str values
+    are files with that content.
+    """
+    os.makedirs(root, exist_ok=True)
+    for name, node in tree.items():
+        path = os.path.join(root, name)
+        if isinstance(node, dict):
+            create_tree(node, path)
+        elif isinstance(node, Symlink):
+            os.symlink(node.target, path, target_is_directory=node.target_is_directory)
+        else:
+            with open(path, "w") as file:
+                file.write(node)
+
+
+OPAQUE_MARKER = overlays.oci_opaque_dir(Path()).name
+
+# A base with a "first" dir and a "second" symlink pointing to "first".
+LINKED_ROOTFS = {"first": {}, "second": Symlink("first")}
+
+# A base where "bin" is a symlink to "usr/bin", like in usrmerge.
+USRMERGE_ROOTFS = {"usr": {"bin": {}}, "bin": Symlink("usr/bin")}
+
+# On top of USRMERGE_ROOTFS, both "bin/dir1" and "usr/bin/dir1" end up as
+# "usr/bin/dir1".
+DUPLICATE_DIRS_LAYER = {
+    "bin": {"dir1": {"a.txt": ""}},
+    "usr": {"bin": {"dir1": {"b.txt": ""}}},
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class LayerExpectation:
+    """The expected tarball entries when archiving a layer over a base rootfs."""
+
+    name: str
+    layer_fs: dict
+    rootfs_fs: dict
+    tar_names: tuple[str, ...]
+
+
+LAYER_EXPECTATIONS = [
+    # Adding a directory as a layer explicitly preserves subdirs.
+    LayerExpectation(
+        name="directories",
+        layer_fs={"first": {"first.txt": ""}, "second": {"second.txt": ""}},
+        rootfs_fs={},
+        tar_names=("first", "first/first.txt", "second", "second/second.txt"),
+    ),
+    # Symlinks are added as they are, both to files and to dirs.
+    LayerExpectation(
+        name="symlinks",
+        layer_fs={
+            "first_dir": {},
+            "first_file": "",
+            "second_dir": Symlink("first_dir", target_is_directory=True),
+            "second_file": Symlink("first_file"),
+        },
+        rootfs_fs={},
+        tar_names=("first_dir", "first_file", "second_dir", "second_file"),
+    ),
     # The tarfile must *not* contain the "./second" dir entry, to preserve
     # the base layer symlink. Additionally, the file "second.txt" must
     # be listed as inside "first/", and not "second/".
-    expected_tar_contents = [
-        "first",
-        "first/first.txt",
-        "first/second.txt",
-    ]
-    assert temp_tar_contents == expected_tar_contents
-
-
-def test_archive_layer_with_base_layer_dir_opaque(tmp_path):
-    """
-    Test creating a layer with a base layer dir for reference, but the new
-    layer hides one of the dirs in the base layer via an opaque whiteout file.
-    """
-    layer_dir = tmp_path / "layer_dir"
-    layer_dir.mkdir()
-
-    (layer_dir / "first").mkdir()
-    (layer_dir / "first/first.txt").touch()
-
-    (layer_dir / "second").mkdir()
-    (layer_dir / "second/second.txt").touch()
-    # Add an opaque marker to signify that "second/" should hide the
-    # base layer's "second" symlink.
-    overlays.oci_opaque_dir(layer_dir / "second").touch()
-
-    # Create a dir tree to act as extracted "base"
-    # It contains a "first" dir and a "second" symlink pointing to "first"
-    rootfs_dir = tmp_path / "rootfs"
-    rootfs_dir.mkdir()
-
-    (rootfs_dir / "first").mkdir()
-    (rootfs_dir / "second").symlink_to("first")
-
-    temp_tar_path = tmp_path / "layer.tar"
-    layers.archive_layer(layer_dir, temp_tar_path, base_layer_dir=rootfs_dir)
-    temp_tar_contents = get_tar_contents(temp_tar_path)
-
-    # The tarfile *must* contain the "second" dir entry, because of the
-    # opaque whiteout file.
-    expected_tar_contents = [
-        "first",
-        "first/first.txt",
-        "second",
-        "second/.wh..wh..opq",
-        "second/second.txt",
-    ]
-    assert sorted(temp_tar_contents) == expected_tar_contents
-
-
-def test_archive_layer_with_base_layer_subdirs(tmp_path):
-    """Test base layer handling with subdirectories."""
-    layer_dir = tmp_path / "layer_dir"
-    layer_dir.mkdir()
-
-    # The path "second/" contains multiple subdirectories.
-    (layer_dir / "second").mkdir()
-    (layer_dir / "second/second.txt").touch()
-
-    (layer_dir / "second/subdir").mkdir()
-    (layer_dir / "second/subdir/subdir_file.txt").touch()
-
-    (layer_dir / "second/subdir/subsubdir").mkdir()
-    (layer_dir / "second/subdir/subsubdir/subsubdir_file.txt").touch()
-
-    (layer_dir / "third").mkdir()
-    (layer_dir / "third/third.txt").touch()
-
-    rootfs_dir = tmp_path / "rootfs"
-    rootfs_dir.mkdir()
-
-    # The base layer has a "first/" dir and a symlink to it called "second".
+    LayerExpectation(
+        name="base-layer-dir",
+        layer_fs={"first": {"first.txt": ""}, "second": {"second.txt": ""}},
+        rootfs_fs=LINKED_ROOTFS,
+        tar_names=("first", "first/first.txt", "first/second.txt"),
+    ),
+    # An opaque whiteout file in "second/" hides the base layer's "second"
+    # symlink, so the tarfile *must* contain the "second" dir entry.
+    LayerExpectation(
+        name="base-layer-dir-opaque",
+        layer_fs={
+            "first": {"first.txt": ""},
+            "second": {"second.txt": "", OPAQUE_MARKER: ""},
+        },
+        rootfs_fs=LINKED_ROOTFS,
+        tar_names=(
+            "first",
+            "first/first.txt",
+            "second",
+            "second/.wh..wh..opq",
+            "second/second.txt",
+        ),
+    ),
     # Every subdirectory in "second/" in the "upper" layer must be added as
     # a subdir of "first".
-    (rootfs_dir / "first").mkdir()
-    (rootfs_dir / "second").symlink_to("first")
-
-    temp_tar_path = tmp_path / "layer.tar"
+    LayerExpectation(
+        name="base-layer-subdirs",
+        layer_fs={
+            "second": {
+                "second.txt": "",
+                "subdir": {
+                    "subdir_file.txt": "",
+                    "subsubdir": {"subsubdir_file.txt": ""},
+                },
+            },
+            "third": {"third.txt": ""},
+        },
+        rootfs_fs=LINKED_ROOTFS,
+        tar_names=(
+            "first/second.txt",
+            "first/subdir",
+            "first/subdir/subdir_file.txt",
+            "first/subdir/subsubdir",
+            "first/subdir/subsubdir/subsubdir_file.txt",
+            "third",
+            "third/third.txt",
+        ),
+    ),
+    # Because of symlinks in the base, multiple directories end up as the
+    # same target.
+    LayerExpectation(
+        name="duplicate-dirs",
+        layer_fs=DUPLICATE_DIRS_LAYER,
+        rootfs_fs=USRMERGE_ROOTFS,
+        tar_names=(
+            "usr",
+            "usr/bin",
+            "usr/bin/dir1",
+            "usr/bin/dir1/a.txt",
+            "usr/bin/dir1/b.txt",
+        ),
+    ),
+    # Multiple files end up at the same target, but they are identical so
+    # the layer must be created successfully.
+    LayerExpectation(
+        name="duplicate-identical-files",
+        layer_fs={
+            "bin": {"dir1": {"a.txt": "", "same.txt": "foobar"}},
+            "usr": {"bin": {"dir1": {"b.txt": "", "same.txt": "foobar"}}},
+        },
+        rootfs_fs=USRMERGE_ROOTFS,
+        tar_names=(
+            "usr",
+            "usr/bin",
+            "usr/bin/dir1",
+            "usr/bin/dir1/a.txt",
+            "usr/bin/dir1/b.txt",
+            "usr/bin/dir1/same.txt",
+        ),
+    ),
+]
+
+
+@pytest.mark.parametrize("case", LAYER_EXPECTATIONS, ids=attrgetter("name"))
+def test_archive_layer(fake_path, mock_tar_add, case):
+    """Test archiving a layer, optionally on top of a base layer for reference."""
+    layer_dir = fake_path / "layer_dir"
+    create_tree(case.layer_fs, layer_dir)
+
+    rootfs_dir = None
+    if case.rootfs_fs:
+        rootfs_dir = fake_path / "rootfs"
+        create_tree(case.rootfs_fs, rootfs_dir)
+
+    temp_tar_path = fake_path / "layer.tar"
     layers.archive_layer(layer_dir, temp_tar_path, base_layer_dir=rootfs_dir)
-    temp_tar_contents = get_tar_contents(temp_tar_path)
-
-    expected_tar_contents = [
-        "first/second.txt",
-        "first/subdir",
-        "first/subdir/subdir_file.txt",
-        "first/subdir/subsubdir",
-        "first/subdir/subsubdir/subsubdir_file.txt",
-        "third",
-        "third/third.txt",
-    ]
-    assert temp_tar_contents == expected_tar_contents
-
-
-def test_archive_layer_duplicate_dirs(tmp_path):
-    """
-    Test creating a layer where, because of symlinks in the base, multiple
-    directories end up as the same target.
-    """
-
-    layer_dir, rootfs_dir = duplicate_dirs_setup(tmp_path)
 
-    temp_tar_path = tmp_path / "layer.tar"
-    layers.archive_layer(layer_dir, temp_tar_path, base_layer_dir=rootfs_dir)
-    temp_tar_contents = get_tar_contents(temp_tar_path)
-
-    expected_tar_contents = [
-        "usr",
-        "usr/bin",
-        "usr/bin/dir1",
-        "usr/bin/dir1/a.txt",
-        "usr/bin/dir1/b.txt",
-    ]
-    assert temp_tar_contents == expected_tar_contents
+    assert tuple(get_tar_contents(mock_tar_add)) == case.tar_names
 
 
-def test_archive_layer_duplicate_dirs_conflict(tmp_path):
+def test_archive_layer_duplicate_dirs_conflict(fake_path):
     """
     Test creating a layer where, because of symlinks in the base, multiple
     directories end up as the same target but the directories have different
     ownership/permissions.
     """
-    layer_dir, rootfs_dir = duplicate_dirs_setup(tmp_path)
+    layer_dir = fake_path / "layer_dir"
+    create_tree(DUPLICATE_DIRS_LAYER, layer_dir)
+    rootfs_dir = fake_path / "rootfs"
+    create_tree(USRMERGE_ROOTFS, rootfs_dir)
 
     # Change the default permissions of the directories that will end up as
     # "/usr/bin/dir1", to ensure that they are different.
@@ -275,18 +256,21 @@ def test_archive_layer_duplicate_dirs_conflict(tmp_path):
         f"{layer_dir / 'bin/dir1'}, "
         f"{layer_dir / 'usr/bin/dir1'}"
     )
-    temp_tar_path = tmp_path / "layer.tar"
+    temp_tar_path = fake_path / "layer.tar"
     with pytest.raises(errors.LayerArchivingError, match=re.escape(expected_message)):
         layers.archive_layer(layer_dir, temp_tar_path, base_layer_dir=rootfs_dir)
 
 
-def test_archive_layer_duplicate_files(tmp_path):
+def test_archive_layer_duplicate_files(fake_path):
     """
     Test creating a layer where, because of symlinks in the base, multiple
     files (not directories) end up at the same target. The files have different
     contents so this must raise an error.
     """
-    layer_dir, rootfs_dir = duplicate_dirs_setup(tmp_path)
+    layer_dir = fake_path / "layer_dir"
+    create_tree(DUPLICATE_DIRS_LAYER, layer_dir)
+    rootfs_dir = fake_path / "rootfs"
+    create_tree(USRMERGE_ROOTFS, rootfs_dir)
 
     # Create files with the same name but different contents in both
     # directories.
@@ -299,38 +283,11 @@ def test_archive_layer_duplicate_files(tmp_path):
         f"{layer_dir / 'bin/dir1/same.txt'}, "
         f"{layer_dir / 'usr/bin/dir1/same.txt'}"
     )
-    temp_tar_path = tmp_path / "layer.tar"
+    temp_tar_path = fake_path / "layer.tar"
     with pytest.raises(errors.LayerArchivingError, match=re.escape(expected_message)):
         layers.archive_layer(layer_dir, temp_tar_path, base_layer_dir=rootfs_dir)
 
 
-def test_archive_layer_duplicate_identical_files(tmp_path):
-    """
-    Test creating a layer where, because of symlinks in the base, multiple
-    files (not directories) end up at the same target. The files are identical
-    so the layer must be created successfully.
-    """
-    layer_dir, rootfs_dir = duplicate_dirs_setup(tmp_path)
-
-    # Create files with the same contents with the same name in both directories
-    (layer_dir / "bin/dir1/same.txt").write_text("foobar")
-    (layer_dir / "usr/bin/dir1/same.txt").write_text("foobar")
-
-    temp_tar_path = tmp_path / "layer.tar"
-    layers.archive_layer(layer_dir, temp_tar_path, base_layer_dir=rootfs_dir)
-    temp_tar_contents = get_tar_contents(temp_tar_path)
-
-    expected_tar_contents = [
-        "usr",
-        "usr/bin",
-        "usr/bin/dir1",
-        "usr/bin/dir1/a.txt",
-        "usr/bin/dir1/b.txt",
-        "usr/bin/dir1/same.txt",
-    ]
-    assert temp_tar_contents == expected_tar_contents
-
-
 def test_prune_prime_files(tmp_path):
     base_layer_dir = tmp_path / "base"
     base_layer_dir.mkdir()
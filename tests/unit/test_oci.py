@@ -13,14 +13,14 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import contextlib
 import datetime
-import hashlib
-import json
+import io
 import os
 import tarfile
 from collections import namedtuple
 from pathlib import Path
-from unittest.mock import ANY, call, mock_open, patch
+from unittest.mock import ANY, Mock, call, patch
 
 import pytest
 from rockcraft import errors, oci
@@ -41,15 +41,126 @@ MOCK_NEW_USER = {
     ),
 }
 
+REAL_PROCESS_RUN = oci._process_run  # pylint: disable=protected-access
+
+IMAGE_PATH = Path("/c")
+COPY_IMAGE_PATH = Path("/f")
+IMAGES_DIR = Path("images/dir")
+BUNDLE_DIR = Path("bundle/dir")
+BUNDLE_IMAGE_DIR = BUNDLE_DIR / "a-b"
+BUNDLE_ROOTFS = BUNDLE_IMAGE_DIR / "rootfs"
+LAYER_DIR = Path("layer_dir")
+
+# The skopeo and umoci commands expected by the TestImage tests.
+SKOPEO_COPY_TO_ARGV = (
+    "skopeo",
+    "--insecure-policy",
+    "copy",
+    "oci:/c/a:b",
+    "oci:/f/d:e",
+)
+UMOCI_UNPACK_ARGV = ("umoci", "unpack", "--image", "/c/a:b", "bundle/dir/a-b")
+UMOCI_UNPACK_ROOTLESS_ARGV = (
+    "umoci",
+    "unpack",
+    "--rootless",
+    "--image",
+    "/c/a:b",
+    "bundle/dir/a-b",
+)
+SKOPEO_TO_DOCKER_DAEMON_ARGV = (
+    "skopeo",
+    "--insecure-policy",
+    "copy",
+    "oci:/c/a:tag",
+    "docker-daemon:a:tag",
+)
+SKOPEO_TO_OCI_ARCHIVE_ARGV = (
+    "skopeo",
+    "--insecure-policy",
+    "copy",
+    "oci:/c/a:tag",
+    "oci-archive:foobar:tag",
+)
+UMOCI_SET_USER_ARGV = (
+    "umoci",
+    "config",
+    "--image",
+    "/c/a:b",
+    "--clear=config.entrypoint",
+    "--config.user",
+    "foo",
+)
+UMOCI_SET_CMD_FOO_ARGV = (
+    "umoci",
+    "config",
+    "--image",
+    "/c/a:b",
+    "--clear=config.cmd",
+    "--config.cmd",
+    "foo",
+)
+UMOCI_SET_CMD_BAR_ARGV = (
+    "umoci",
+    "config",
+    "--image",
+    "/c/a:b",
+    "--clear=config.cmd",
+    "--config.cmd",
+    "bar",
+)
+UMOCI_SET_ENV_ARGV = (
+    "umoci",
+    "config",
+    "--image",
+    "/c/a:b",
+    "--config.env",
+    "NAME1=VALUE1",
+    "--config.env",
+    "NAME2=VALUE2",
+)
+UMOCI_STAT_ARGV = ("umoci", "stat", "--json", "--image", "images/dir/bare:latest")
+
+# The blobs of an image with an empty config, as read from its layout.
+INDEX_BYTES = b'{"manifests": [{"digest": "sha256:foomanifest"}]}'
+MANIFEST_BYTES = b'{"config": {"digest": "sha256:fooconfig"}}'
+CONFIG_BYTES = b"{}"
+
+# The blobs written when injecting the "v0" variant into an image with an
+# empty config, and the sha256 digests that reference them.
+NEW_CONFIG_BYTES = b'{"variant": "v0"}'
+NEW_CONFIG_DIGEST = "29348c45aa8e41b2de75d2b1be5a6abbcbc04f0d4f5b3e2a8a080f7453c4a007"
+NEW_MANIFEST_BYTES = (
+    '{"config": {"digest": "sha256:' + NEW_CONFIG_DIGEST + '", "size": 17}}'
+).encode("utf-8")
+NEW_MANIFEST_DIGEST = "33ada660746e27fe78fe816a78dd740b32e367cd3507f184102f3a6d99295cb2"
+NEW_INDEX_BYTES = (
+    '{"manifests": [{"digest": "sha256:' + NEW_MANIFEST_DIGEST + '", "size": 109}]}'
+).encode("utf-8")
+
+
+@pytest.fixture(scope="session")
+def sample_image():
+    return oci.Image("a:b", IMAGE_PATH)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _patch_process_run(module_mocker):
+    """Keep skopeo and umoci from ever running; tests access it via ``mock_run``."""
+    return module_mocker.patch(
+        "rockcraft.oci._process_run", new_callable=Mock, spec=True
+    )
+
 
 @pytest.fixture()
-def mock_run(mocker):
-    return mocker.patch("rockcraft.oci._process_run")
+def mock_run(_patch_process_run):
+    _patch_process_run.reset_mock(return_value=True, side_effect=True)
+    return _patch_process_run
 
 
 @pytest.fixture()
 def mock_archive_layer(mocker):
-    return mocker.patch("rockcraft.layers.archive_layer")
+    return mocker.patch("rockcraft.layers.archive_layer", new_callable=Mock, spec=True)
 
 
 @pytest.fixture()
@@ -59,7 +170,7 @@ def mock_rmtree(mocker):
 
 @pytest.fixture()
 def mock_mkdir(mocker):
-    return mocker.patch("pathlib.Path.mkdir")
+    return mocker.patch.object(Path, "mkdir", new_callable=Mock, return_value=None)
 
 
 @pytest.fixture()
@@ -74,17 +185,19 @@ def mock_tmpdir(mocker):
 
 @pytest.fixture()
 def mock_inject_variant(mocker):
-    return mocker.patch("rockcraft.oci._inject_architecture_variant")
+    return mocker.patch(
+        "rockcraft.oci._inject_architecture_variant", new_callable=Mock, spec=True
+    )
 
 
 @pytest.fixture()
 def mock_read_bytes(mocker):
-    return mocker.patch("pathlib.Path.read_bytes")
+    return mocker.patch("pathlib.Path.read_bytes", new_callable=Mock, spec=True)
 
 
 @pytest.fixture()
 def mock_write_bytes(mocker):
-    return mocker.patch("pathlib.Path.write_bytes")
+    return mocker.patch("pathlib.Path.write_bytes", new_callable=Mock, spec=True)
 
 
 @pytest.fixture()
@@ -97,54 +210,39 @@ class TestImage:
     """OCI image manipulation."""
 
     def test_attributes(self):
-        image = oci.Image("a:b", Path("/c"))
+        image = oci.Image("a:b", IMAGE_PATH)
         assert image.image_name == "a:b"
-        assert image.path == Path("/c")
+        assert image.path == IMAGE_PATH
 
-    def test_from_docker_registry(self, mock_run, new_dir):
+    @pytest.mark.parametrize(
+        ("arch", "variant_args"),
+        [
+            ("amd64", []),
+            ("arm64", ["--override-variant", "v8"]),
+        ],
+    )
+    def test_from_docker_registry(self, mock_run, new_dir, arch, variant_args):
         image, source_image = oci.Image.from_docker_registry(
-            "a@b", image_dir=Path("images/dir"), arch="amd64"
+            "a@b", image_dir=IMAGES_DIR, arch=arch
         )
-        assert Path("images/dir").is_dir()
+        assert IMAGES_DIR.is_dir()
         assert image.image_name == "a:b"
         assert source_image == f"docker://{oci.REGISTRY_URL}/a:b"
-        assert image.path == Path("images/dir")
-        assert mock_run.mock_calls == [
-            call(
-                [
-                    "skopeo",
-                    "--insecure-policy",
-                    "--override-arch",
-                    "amd64",
-                    "copy",
-                    "--retry-times",
-                    str(oci.MAX_DOWNLOAD_RETRIES),
-                    f"docker://{oci.REGISTRY_URL}/a:b",
-                    "oci:images/dir/a:b",
-                ]
-            )
-        ]
-        mock_run.reset_mock()
-        _ = oci.Image.from_docker_registry(
-            "a@b", image_dir=Path("images/dir"), arch="arm64"
+        assert image.path == IMAGES_DIR
+        mock_run.assert_called_once_with(
+            [
+                "skopeo",
+                "--insecure-policy",
+                "--override-arch",
+                arch,
+                *variant_args,
+                "copy",
+                "--retry-times",
+                str(oci.MAX_DOWNLOAD_RETRIES),
+                f"docker://{oci.REGISTRY_URL}/a:b",
+                "oci:images/dir/a:b",
+            ]
         )
-        assert mock_run.mock_calls == [
-            call(
-                [
-                    "skopeo",
-                    "--insecure-policy",
-                    "--override-arch",
-                    "arm64",
-                    "--override-variant",
-                    "v8",
-                    "copy",
-                    "--retry-times",
-                    str(oci.MAX_DOWNLOAD_RETRIES),
-                    f"docker://{oci.REGISTRY_URL}/a:b",
-                    "oci:images/dir/a:b",
-                ]
-            )
-        ]
 
     def _get_arch_from_call(self, mock_call):
         ArchData = namedtuple("ArchData", ["override_arch", "override_variant"])
@@ -178,9 +276,7 @@ class TestImage:
         self, mock_run, new_dir, deb_arch, expected_arch, expected_variant
     ):
         """Test that the correct arch-related parameters are passed to skopeo."""
-        oci.Image.from_docker_registry(
-            "a@b", image_dir=Path("images/dir"), arch=deb_arch
-        )
+        oci.Image.from_docker_registry("a@b", image_dir=IMAGES_DIR, arch=deb_arch)
         arch_data = self._get_arch_from_call(mock_run.mock_calls[0])
 
         assert arch_data.override_arch == expected_arch
@@ -191,104 +287,79 @@ class TestImage:
         """Test that new blank images are created with the correct GOARCH values."""
         expected = SUPPORTED_ARCHS[deb_arch]
 
-        image_dir = Path("images/dir")
         image, source_image = oci.Image.new_oci_image(
-            "bare@latest", image_dir=image_dir, arch=deb_arch
+            "bare@latest", image_dir=IMAGES_DIR, arch=deb_arch
         )
-        assert image_dir.is_dir()
+        assert IMAGES_DIR.is_dir()
         assert image.image_name == "bare:latest"
-        assert source_image == f"oci:{str(image_dir)}/bare:latest"
-        assert image.path == Path("images/dir")
-        assert mock_run.mock_calls == [
-            call(["umoci", "init", "--layout", f"{image_dir}/bare"]),
-            call(["umoci", "new", "--image", f"{image_dir}/bare:latest"]),
+        assert source_image == f"oci:{str(IMAGES_DIR)}/bare:latest"
+        assert image.path == IMAGES_DIR
+        expected_calls = [
+            call(["umoci", "init", "--layout", f"{IMAGES_DIR}/bare"]),
+            call(["umoci", "new", "--image", f"{IMAGES_DIR}/bare:latest"]),
             call(
                 [
                     "umoci",
                     "config",
                     "--image",
-                    f"{image_dir}/bare:latest",
+                    f"{IMAGES_DIR}/bare:latest",
                     "--architecture",
                     expected.go_arch,
                     "--no-history",
                 ]
             ),
         ]
+        mock_run.assert_has_calls(expected_calls)
+        assert len(mock_run.call_args_list) == len(expected_calls)
         if expected.go_variant is None:
             mock_inject_variant.assert_not_called()
         else:
             mock_inject_variant.assert_called_once_with(
-                image_dir / "bare", expected.go_variant
+                IMAGES_DIR / "bare", expected.go_variant
             )
 
-    def test_copy_to(self, mock_run):
-        image = oci.Image("a:b", Path("/c"))
-        new_image = image.copy_to("d:e", image_dir=Path("/f"))
+    def test_copy_to(self, sample_image, mock_run):
+        new_image = sample_image.copy_to("d:e", image_dir=COPY_IMAGE_PATH)
         assert new_image.image_name == "d:e"
-        assert new_image.path == Path("/f")
-        assert mock_run.mock_calls == [
-            call(
-                [
-                    "skopeo",
-                    "--insecure-policy",
-                    "copy",
-                    "oci:/c/a:b",
-                    "oci:/f/d:e",
-                ]
-            )
-        ]
+        assert new_image.path == COPY_IMAGE_PATH
+        mock_run.assert_called_once_with(list(SKOPEO_COPY_TO_ARGV))
 
-    def test_extract_to(self, mock_run, new_dir):
-        image = oci.Image("a:b", Path("/c"))
-        bundle_path = image.extract_to(Path("bundle/dir"))
-        assert Path("bundle/dir").is_dir()
-        assert bundle_path == Path("bundle/dir/a-b/rootfs")
-        assert mock_run.mock_calls == [
-            call(["umoci", "unpack", "--image", "/c/a:b", "bundle/dir/a-b"])
-        ]
+    def test_extract_to(self, sample_image, mock_run, new_dir):
+        bundle_path = sample_image.extract_to(BUNDLE_DIR)
+        assert BUNDLE_DIR.is_dir()
+        assert bundle_path == BUNDLE_ROOTFS
+        mock_run.assert_called_once_with(list(UMOCI_UNPACK_ARGV))
 
-    def test_extract_to_rootless(self, mock_run, new_dir):
-        image = oci.Image("a:b", Path("/c"))
-        bundle_path = image.extract_to(Path("bundle/dir"), rootless=True)
-        assert Path("bundle/dir").is_dir()
-        assert bundle_path == Path("bundle/dir/a-b/rootfs")
-        assert mock_run.mock_calls == [
-            call(
-                [
-                    "umoci",
-                    "unpack",
-                    "--rootless",
-                    "--image",
-                    "/c/a:b",
-                    "bundle/dir/a-b",
-                ]
-            )
-        ]
+    def test_extract_to_rootless(self, sample_image, mock_run, new_dir):
+        bundle_path = sample_image.extract_to(BUNDLE_DIR, rootless=True)
+        assert BUNDLE_DIR.is_dir()
+        assert bundle_path == BUNDLE_ROOTFS
+        mock_run.assert_called_once_with(list(UMOCI_UNPACK_ROOTLESS_ARGV))
 
     def test_extract_to_existing_dir(self, mock_run, new_dir):
         image = oci.Image("a:b", Path("c"))
-        Path("bundle/dir/a-b").mkdir(parents=True)
-        Path("bundle/dir/a-b/foo.txt").touch()
+        BUNDLE_IMAGE_DIR.mkdir(parents=True)
+        (BUNDLE_IMAGE_DIR / "foo.txt").touch()
 
-        bundle_path = image.extract_to(Path("bundle/dir"))
-        assert Path("bundle/dir/a-b/foo.txt").exists() is False
-        assert bundle_path == Path("bundle/dir/a-b/rootfs")
+        bundle_path = image.extract_to(BUNDLE_DIR)
+        assert (BUNDLE_IMAGE_DIR / "foo.txt").exists() is False
+        assert bundle_path == BUNDLE_ROOTFS
 
     def test_add_layer(self, mocker, mock_run, new_dir):
         image = oci.Image("a:b", new_dir / "c")
         Path("c").mkdir()
-        Path("layer_dir").mkdir()
-        Path("layer_dir/foo.txt").touch()
+        LAYER_DIR.mkdir()
+        (LAYER_DIR / "foo.txt").touch()
         pid = os.getpid()
 
         spy_add = mocker.spy(tarfile.TarFile, "add")
 
-        image.add_layer("tag", Path("layer_dir"))
+        image.add_layer("tag", LAYER_DIR)
         # The `Tarfile.add()` on the directory ends up calling the method multiple
         # times (due to the recursion), but we're mainly interested that the first
         # call was to add `layer_dir`.
         assert spy_add.mock_calls[0] == call(
-            ANY, Path("layer_dir/foo.txt"), arcname="foo.txt", recursive=False
+            ANY, LAYER_DIR / "foo.txt", arcname="foo.txt", recursive=False
         )
 
         expected_cmd = [
@@ -301,12 +372,13 @@ class TestImage:
             "--tag",
             "tag",
         ]
-        assert mock_run.mock_calls == [
+        assert mock_run.call_args_list == [
             call(expected_cmd + ["--history.created_by", " ".join(expected_cmd)])
         ]
 
     def test_add_new_user(
         self,
+        sample_image,
         check,
         mock_tmpdir,
         mock_add_layer,
@@ -315,8 +387,7 @@ class TestImage:
         fake_tmpfs = tmp_path / "mock-tmp"
         mock_tmpdir.return_value = fake_tmpfs
 
-        image = oci.Image("a:b", Path("/c"))
-        image.add_user(
+        sample_image.add_user(
             tmp_path / "prime",
             tmp_path,
             "mock-tag",
@@ -340,7 +411,7 @@ class TestImage:
         # Test with a conflicting user or ID.
         # Use the new fs as a base to force the error.
         with pytest.raises(errors.RockcraftError) as err:
-            image.add_user(
+            sample_image.add_user(
                 tmp_path / "prime",
                 fake_tmpfs,
                 "mock-tag",
@@ -352,7 +423,7 @@ class TestImage:
             )
 
         with pytest.raises(errors.RockcraftError) as err:
-            image.add_user(
+            sample_image.add_user(
                 tmp_path / "prime",
                 fake_tmpfs,
                 "mock-tag",
@@ -429,6 +500,7 @@ class TestImage:
     )
     def test_append_new_user(
         self,
+        sample_image,
         check,
         mock_tmpdir,
         mock_add_layer,
@@ -459,8 +531,7 @@ class TestImage:
         fake_tmp_new_layer = tmp_path / "mock-tmp"
         mock_tmpdir.return_value = fake_tmp_new_layer
 
-        image = oci.Image("a:b", Path("/c"))
-        image.add_user(
+        sample_image.add_user(
             fake_prime,
             tmp_path,
             "mock-tag",
@@ -484,39 +555,16 @@ class TestImage:
                 expected_user_files["shadow"],
             )
 
-    def test_to_docker_daemon(self, mock_run):
-        image = oci.Image("a:b", Path("/c"))
-        image.to_docker_daemon("tag")
-        assert mock_run.mock_calls == [
-            call(
-                [
-                    "skopeo",
-                    "--insecure-policy",
-                    "copy",
-                    "oci:/c/a:tag",
-                    "docker-daemon:a:tag",
-                ]
-            )
-        ]
+    def test_to_docker_daemon(self, sample_image, mock_run):
+        sample_image.to_docker_daemon("tag")
+        mock_run.assert_called_once_with(list(SKOPEO_TO_DOCKER_DAEMON_ARGV))
 
-    def test_to_oci_archive(self, mock_run):
-        image = oci.Image("a:b", Path("/c"))
-        image.to_oci_archive("tag", filename="foobar")
-        assert mock_run.mock_calls == [
-            call(
-                [
-                    "skopeo",
-                    "--insecure-policy",
-                    "copy",
-                    "oci:/c/a:tag",
-                    "oci-archive:foobar:tag",
-                ]
-            )
-        ]
+    def test_to_oci_archive(self, sample_image, mock_run):
+        sample_image.to_oci_archive("tag", filename="foobar")
+        mock_run.assert_called_once_with(list(SKOPEO_TO_OCI_ARCHIVE_ARGV))
 
-    def test_digest(self, mocker):
+    def test_digest(self, sample_image, mocker):
         source_image = "docker://ubuntu:22.04"
-        image = oci.Image("a:b", Path("/c"))
         mock_output = mocker.patch(
             "subprocess.check_output",
             return_value="000102030405060708090a0b0c0d0e0f",
@@ -526,41 +574,25 @@ class TestImage:
             return_value="/usr/bin/skopeo",
         )
 
-        digest = image.digest(source_image)
-        assert mock_skopeo.mock_calls == [call("skopeo")]
-        assert mock_output.mock_calls == [
-            call(
-                [
-                    "/usr/bin/skopeo",
-                    "inspect",
-                    "--format",
-                    "{{.Digest}}",
-                    "-n",
-                    source_image,
-                ],
-                text=True,
-            )
-        ]
+        digest = sample_image.digest(source_image)
+        mock_skopeo.assert_called_once_with("skopeo")
+        mock_output.assert_called_once_with(
+            [
+                "/usr/bin/skopeo",
+                "inspect",
+                "--format",
+                "{{.Digest}}",
+                "-n",
+                source_image,
+            ],
+            text=True,
+        )
         assert digest == bytes([0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15])
 
-    def test_set_default_user(self, mock_run):
-        image = oci.Image("a:b", Path("/c"))
-
-        image.set_default_user("foo")
+    def test_set_default_user(self, sample_image, mock_run):
+        sample_image.set_default_user("foo")
 
-        assert mock_run.mock_calls == [
-            call(
-                [
-                    "umoci",
-                    "config",
-                    "--image",
-                    "/c/a:b",
-                    "--clear=config.entrypoint",
-                    "--config.user",
-                    "foo",
-                ]
-            )
-        ]
+        mock_run.assert_called_once_with(list(UMOCI_SET_USER_ARGV))
 
     @pytest.mark.parametrize(
         ("service", "build_base", "pebble_binary", "verbose", "service_config"),
@@ -606,17 +638,22 @@ class TestImage:
         ],
     )
     def test_set_entrypoint_default(
-        self, mock_run, service, build_base, pebble_binary, verbose, service_config
+        self,
+        sample_image,
+        mock_run,
+        service,
+        build_base,
+        pebble_binary,
+        verbose,
+        service_config,
     ):
-        image = oci.Image("a:b", Path("/tmp"))
-
-        image.set_entrypoint(service, build_base)
+        sample_image.set_entrypoint(service, build_base)
 
         arg_list = [
             "umoci",
             "config",
             "--image",
-            "/tmp/a:b",
+            "/c/a:b",
             "--clear=config.entrypoint",
             "--config.entrypoint",
             f"/{pebble_binary}",
@@ -629,51 +666,22 @@ class TestImage:
 
         arg_list.append("--clear=config.cmd")
 
-        assert mock_run.mock_calls == [
-            call(arg_list),
-        ]
+        mock_run.assert_called_once_with(arg_list)
 
-    def test_set_cmd_empty(self, mock_run):
-        image = oci.Image("a:b", Path("/c"))
-        image.set_cmd()
+    def test_set_cmd_empty(self, sample_image, mock_run):
+        sample_image.set_cmd()
 
-        assert mock_run.mock_calls == []
+        mock_run.assert_not_called()
 
-    def test_set_cmd_nonempty(self, mock_run):
-        image = oci.Image("a:b", Path("/c"))
-        image.set_cmd("echo [ foo ]")
+    def test_set_cmd_nonempty(self, sample_image, mock_run):
+        sample_image.set_cmd("echo [ foo ]")
 
-        assert mock_run.mock_calls == [
-            call(
-                [
-                    "umoci",
-                    "config",
-                    "--image",
-                    "/c/a:b",
-                    "--clear=config.cmd",
-                    "--config.cmd",
-                    "foo",
-                ]
-            ),
-        ]
+        mock_run.assert_called_once_with(list(UMOCI_SET_CMD_FOO_ARGV))
 
-    def test_set_cmd_nonempty2(self, mock_run):
-        image = oci.Image("a:b", Path("/c"))
-        image.set_cmd("echo foo [ bar ]")
+    def test_set_cmd_nonempty2(self, sample_image, mock_run):
+        sample_image.set_cmd("echo foo [ bar ]")
 
-        assert mock_run.mock_calls == [
-            call(
-                [
-                    "umoci",
-                    "config",
-                    "--image",
-                    "/c/a:b",
-                    "--clear=config.cmd",
-                    "--config.cmd",
-                    "bar",
-                ]
-            ),
-        ]
+        mock_run.assert_called_once_with(list(UMOCI_SET_CMD_BAR_ARGV))
 
     @pytest.mark.parametrize(
         ("mock_services", "mock_checks"),
@@ -715,6 +723,7 @@ class TestImage:
     )
     def test_set_pebble_layer(
         self,
+        sample_image,
         mock_services,
         mock_checks,
         mock_add_layer,
@@ -722,8 +731,6 @@ class TestImage:
         tmp_path,
         mocker,
     ):
-        image = oci.Image("a:b", Path("/c"))
-
         mock_summary = "summary"
         mock_description = "description"
 
@@ -748,7 +755,7 @@ class TestImage:
         fake_tmpfs = tmp_path / "mock-tmp-pebble-layer-path"
         mock_tmpdir.return_value = fake_tmpfs
 
-        image.set_pebble_layer(
+        sample_image.set_pebble_layer(
             mock_services,
             mock_checks,
             mock_name,
@@ -764,36 +771,20 @@ class TestImage:
             fake_tmpfs, mock_base_layer_dir, expected_layer, mock_name
         )
 
-    def test_set_environment(self, mock_run):
-        image = oci.Image("a:b", Path("/c"))
-
-        image.set_environment({"NAME1": "VALUE1", "NAME2": "VALUE2"})
+    def test_set_environment(self, sample_image, mock_run):
+        sample_image.set_environment({"NAME1": "VALUE1", "NAME2": "VALUE2"})
 
-        assert mock_run.mock_calls == [
-            call(
-                [
-                    "umoci",
-                    "config",
-                    "--image",
-                    "/c/a:b",
-                    "--config.env",
-                    "NAME1=VALUE1",
-                    "--config.env",
-                    "NAME2=VALUE2",
-                ]
-            )
-        ]
+        mock_run.assert_called_once_with(list(UMOCI_SET_ENV_ARGV))
 
     def test_set_control_data(
         self,
+        sample_image,
         mock_archive_layer,
         mock_rmtree,
         mock_mkdir,
         mock_mkdtemp,
         mock_run,
     ):
-        image = oci.Image("a:b", Path("/c"))
-
         mock_control_data_path = "layer_dir"
         mock_mkdtemp.return_value = mock_control_data_path
 
@@ -804,19 +795,13 @@ class TestImage:
             n=os.linesep
         )
 
-        mocked_data = {"writes": ""}
-
-        def mock_write(s):
-            mocked_data["writes"] += s
-
-        m = mock_open()
-        with patch("pathlib.Path.open", m):
+        written = io.StringIO()
+        with patch.object(Path, "open", return_value=contextlib.nullcontext(written)):
             with patch("pathlib.Path.chmod") as local_mock_chmod:
-                m.return_value.write = mock_write
-                image.set_control_data(metadata)
+                sample_image.set_control_data(metadata)
 
         local_mock_chmod.assert_called_once_with(0o644)
-        assert mocked_data["writes"] == expected
+        assert written.getvalue() == expected
         mock_mkdtemp.assert_called_once()
         mock_mkdir.assert_called_once()
         mock_archive_layer.assert_called_once_with(
@@ -831,21 +816,22 @@ class TestImage:
             "/c/a:b",
             str(f"/c/.temp_layer.control_data.{os.getpid()}.tar"),
         ]
-        assert mock_run.mock_calls == [
+        assert mock_run.call_args_list == [
             call(
                 expected_cmd + ["--history.created_by", " ".join(expected_cmd)],
             )
         ]
         mock_rmtree.assert_called_once_with(Path(mock_control_data_path))
 
-    def test_set_annotations(self, mocker):
+    def test_set_annotations(self, sample_image, mocker):
+        # Exercise the real _process_run(), down to subprocess.run().
+        mocker.patch("rockcraft.oci._process_run", new=REAL_PROCESS_RUN)
         mocker.patch("rockcraft.utils.get_host_command").return_value = "umoci"
         mock_run = mocker.patch("subprocess.run")
-        image = oci.Image("a:b", Path("/c"))
 
-        image.set_annotations({"NAME1": "VALUE1", "NAME2": "VALUE2"})
+        sample_image.set_annotations({"NAME1": "VALUE1", "NAME2": "VALUE2"})
 
-        assert mock_run.mock_calls == [
+        expected_calls = [
             call(
                 [
                     "umoci",
@@ -879,59 +865,24 @@ class TestImage:
                 text=True,
             ),
         ]
+        mock_run.assert_has_calls(expected_calls)
+        assert len(mock_run.call_args_list) == len(expected_calls)
 
     def test_inject_architecture_variant(self, mock_read_bytes, mock_write_bytes):
-        test_index = {"manifests": [{"digest": "sha256:foomanifest"}]}
-        test_manifest = {"config": {"digest": "sha256:fooconfig"}}
-        test_config = {}
-        mock_read_bytes.side_effect = [
-            json.dumps(test_index),
-            json.dumps(test_manifest),
-            json.dumps(test_config),
-        ]
-        test_variant = "v0"
-
-        new_test_config = {**test_config, **{"variant": test_variant}}
-        new_test_config_bytes = json.dumps(new_test_config).encode("utf-8")
-
-        new_image_config_digest = hashlib.sha256(new_test_config_bytes).hexdigest()
-        new_test_manifest = {
-            **test_manifest,
-            **{
-                "config": {
-                    "digest": f"sha256:{new_image_config_digest}",
-                    "size": len(new_test_config_bytes),
-                }
-            },
-        }
-        new_test_manifest_bytes = json.dumps(new_test_manifest).encode("utf-8")
-        new_test_manifest_digest = hashlib.sha256(new_test_manifest_bytes).hexdigest()
-
-        new_test_index = {
-            **test_index,
-            **{
-                "manifests": [
-                    {
-                        "digest": f"sha256:{new_test_manifest_digest}",
-                        "size": len(new_test_manifest_bytes),
-                    }
-                ]
-            },
-        }
+        mock_read_bytes.side_effect = [INDEX_BYTES, MANIFEST_BYTES, CONFIG_BYTES]
 
         # pylint: disable=protected-access
-        oci._inject_architecture_variant(Path("img"), test_variant)
+        oci._inject_architecture_variant(Path("img"), "v0")
         assert mock_read_bytes.call_count == 3
         assert mock_write_bytes.mock_calls == [
-            call(new_test_config_bytes),
-            call(new_test_manifest_bytes),
-            call(json.dumps(new_test_index).encode("utf-8")),
+            call(NEW_CONFIG_BYTES),
+            call(NEW_MANIFEST_BYTES),
+            call(NEW_INDEX_BYTES),
         ]
 
     def test_stat(self, new_dir, mock_run, mocker):
-        image_dir = Path("images/dir")
         image, _ = oci.Image.new_oci_image(
-            "bare@latest", image_dir=image_dir, arch="amd64"
+            "bare@latest", image_dir=IMAGES_DIR, arch="amd64"
         )
 
         mock_loads = mocker.patch("json.loads")
@@ -939,15 +890,5 @@ class TestImage:
 
         image.stat()
 
-        assert mock_run.mock_calls == [
-            call(
-                [
-                    "umoci",
-                    "stat",
-                    "--json",
-                    "--image",
-                    "images/dir/bare:latest",
-                ]
-            )
-        ]
+        mock_run.assert_called_once_with(list(UMOCI_STAT_ARGV))
         assert mock_loads.called